@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import ValidationError
+from pydantic import Field, ValidationError, model_validator
 
 
 class Settings(BaseSettings):
@@ -14,6 +14,28 @@ class Settings(BaseSettings):
     bucket_name: str
     aws_access_key: str
     aws_secret_key: str
+    aws_region: str = "us-east-1"
+    # Route S3 requests through Transfer Acceleration (must also be enabled on the bucket)
+    s3_accelerate: bool = False
+    # Files below the threshold are sent with a single PutObject; larger ones as multipart
+    # uploads in parts of s3_multipart_chunksize bytes (5 MiB to 5 GiB). The threshold is
+    # buffered in memory, so it may not exceed the chunk size
+    s3_multipart_threshold: int = Field(16 * 1024 * 1024, ge=0)
+    s3_multipart_chunksize: int = Field(50 * 1024 * 1024, ge=5 * 1024 ** 2, le=5 * 1024 ** 3)
+    # Multipart parts held in memory at once across all uploads in one worker
+    s3_max_buffered_parts: int = Field(8, ge=1)
+
+    # Remember keys known to exist in S3 so duplicate uploads are rejected before their
+    # body is read. Entries are per worker and only a hint, confirmed with a HEAD on hit
+    metadata_cache_enabled: bool = False
+    metadata_cache_ttl_seconds: int = 8 * 60 * 60
+    metadata_cache_max_items: int = 4096
+
+    @model_validator(mode="after")
+    def check_multipart_threshold(self):
+        if self.s3_multipart_threshold > self.s3_multipart_chunksize:
+            raise ValueError("s3_multipart_threshold must not exceed s3_multipart_chunksize")
+        return self
 
     def __init__(self, **data):
         super().__init__(**data)
@@ -1,15 +1,48 @@
-from fastapi import FastAPI, UploadFile, Form, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.responses import ORJSONResponse
+from botocore.config import Config
 from botocore.exceptions import NoCredentialsError, ClientError
-from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 from config import settings
+from multipart_stream import MultipartFileStream, MultipartStreamError
 from loguru import logger
-import os
+from cachetools import TTLCache
+import asyncio
+import re
+import sys
 import boto3
+from os.path import commonprefix
+from urllib.parse import quote
 
 
-app = FastAPI()
+# Log from a background thread so writing to stderr never blocks the event loop
+logger.remove()
+logger.add(sys.stderr, level="INFO", enqueue=True, backtrace=False, diagnose=False)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One S3 client per worker, shared by every request so pooled connections and
+    # TLS sessions are reused. S3 calls run via asyncio.to_thread, so the default
+    # executor gets a thread per pooled connection.
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=S3_MAX_POOL_CONNECTIONS)
+    )
+    app.state.s3 = boto3.client(
+        "s3",
+        region_name=AWS_REGION,
+        aws_access_key_id=AWS_ACCESS_KEY,
+        aws_secret_access_key=AWS_SECRET_KEY,
+        config=s3_config
+    )
+    yield
+    app.state.s3.close()
+    await logger.complete()
+
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -20,139 +53,474 @@ app.add_middleware(
 )
 
 # Allowed MIME types
-ALLOWED_MIME_TYPES = [
+ALLOWED_MIME_TYPES = frozenset({
     "application/pdf",  # PDF
     # Remove .docx from allowed mime types for now
     # "application/vnd.openxmlformats-officedocument.wordprocessingml.document"  # .docx
-]
+})
+# Generic type some clients send for any file; accepted only if the content sniffs as a PDF
+GENERIC_MIME_TYPE = "application/octet-stream"
+# Files must start with the %PDF- header, optionally after whitespace within the first 1 KiB
+PDF_SIGNATURE = b"%PDF-"
+PDF_SIGNATURE_WINDOW = 1024
+
+# Valid object names: a single path segment of safe ASCII characters, not starting with
+# "." and not starting or ending with a space
+KEY_RE = re.compile(r"(?![. ])[A-Za-z0-9._\-() ]{0,254}[A-Za-z0-9._\-()]")
+# Most names accepted by one existence check request
+MAX_BATCH_NAMES = 1000
+# LIST pages one existence check may use before falling back to HEADs
+EXISTS_MAX_LIST_PAGES = 3
+# Concurrent HEADs for names the listing doesn't settle
+EXISTS_HEAD_CONCURRENCY = 16
 
 # AWS S3 Configuration
 AWS_ACCESS_KEY = settings.aws_access_key
 AWS_SECRET_KEY = settings.aws_secret_key
 BUCKET_NAME = settings.bucket_name
+AWS_REGION = settings.aws_region
+S3_ACCELERATE = settings.s3_accelerate
+# Public URL prefix for objects in the bucket (regional virtual-hosted style)
+BUCKET_URL_PREFIX = f"https://{BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/"
 
-# S3 Client
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY
+# S3 client configuration, sized for many concurrent part uploads per worker
+S3_MAX_POOL_CONNECTIONS = 64
+s3_config = Config(
+    max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+    retries={"max_attempts": 3, "mode": "adaptive"},
+    tcp_keepalive=True,
+    s3={"addressing_style": "virtual", "use_accelerate_endpoint": S3_ACCELERATE}
 )
+# Uploads smaller than this skip multipart (saves the create/complete round-trips)
+MULTIPART_THRESHOLD = settings.s3_multipart_threshold
+# Size of each part sent to S3 while streaming an upload (S3 minimum is 5 MiB)
+MULTIPART_CHUNK_SIZE = settings.s3_multipart_chunksize
+# Parts uploaded in parallel per file, so one upload can't take the whole budget below
+MULTIPART_MAX_CONCURRENCY = 4
+# Parts copied out and in flight across all uploads in this worker. On top of that, each
+# large upload fills one buffer of its own, so worst-case upload RSS per worker is about
+# (MAX_BUFFERED_PARTS + concurrent large uploads) * MULTIPART_CHUNK_SIZE
+MAX_BUFFERED_PARTS = settings.s3_max_buffered_parts
+buffered_parts = asyncio.Semaphore(MAX_BUFFERED_PARTS)
+# Errors S3 returns when a conditional (If-None-Match: *) write hits an existing key
+KEY_EXISTS_ERROR_CODES = {"PreconditionFailed", "ConditionalRequestConflict"}
+
+# Keys known to exist in S3 (per worker). A hit is confirmed with a HEAD, after which
+# duplicates can be rejected before reading their body
+existing_keys = TTLCache(
+    maxsize=settings.metadata_cache_max_items,
+    ttl=settings.metadata_cache_ttl_seconds
+) if settings.metadata_cache_enabled else None
+
+
+async def key_exists(s3_client, s3_file_key):
+    try:
+        await asyncio.to_thread(s3_client.head_object, Bucket=BUCKET_NAME, Key=s3_file_key)
+    except ClientError as e:
+        if e.response['Error']['Code'] == "404":
+            return False
+        raise
+    return True
+
+
+async def find_existing_keys(s3_client, s3_file_keys):
+    """Return which of the given keys exist.
+
+    Names sharing a prefix are settled by listing from just below the smallest
+    name, so only keys in the requested range are walked. Names the first few
+    pages don't reach, or all of them when there is no common prefix, fall back
+    to concurrent HEADs.
+    """
+    wanted_set = set(s3_file_keys)
+    wanted = sorted(wanted_set)
+    found = set()
+    unsettled = wanted
+
+    prefix = commonprefix(wanted)
+    if prefix:
+        first = wanted[0]
+        # StartAfter is exclusive: use a key that sorts just before the first name
+        params = {
+            "Bucket": BUCKET_NAME,
+            "Prefix": prefix,
+            "StartAfter": first[:-1] + chr(ord(first[-1]) - 1) + "\U0010ffff"
+        }
+        for _ in range(EXISTS_MAX_LIST_PAGES):
+            page = await asyncio.to_thread(s3_client.list_objects_v2, **params)
+            contents = page.get("Contents", [])
+            found.update(obj["Key"] for obj in contents if obj["Key"] in wanted_set)
+            if not page.get("IsTruncated"):
+                unsettled = []
+                break
+            # Listings are sorted, so everything up to the last listed key is settled
+            unsettled = [key for key in unsettled if key > contents[-1]["Key"]]
+            if not unsettled:
+                break
+            params["ContinuationToken"] = page["NextContinuationToken"]
+
+    semaphore = asyncio.Semaphore(EXISTS_HEAD_CONCURRENCY)
+
+    async def check(key):
+        async with semaphore:
+            return key, await key_exists(s3_client, key)
+
+    for key, exists in await asyncio.gather(*(check(key) for key in unsettled)):
+        if exists:
+            found.add(key)
+    return found
+
+
+def is_safe_document_name(name):
+    """Looser check for names of existing objects, which may predate KEY_RE."""
+    return (
+        isinstance(name, str)
+        and name != ""
+        and not any(segment in (".", "..") for segment in name.split("/"))
+    )
+
+
+def reject_unread(status_code, content):
+    """Respond before the upload body has been read.
+
+    Closing the connection makes the server drop the rest of the body instead of
+    draining it, so a rejected multi-GB upload stops costing bandwidth immediately.
+    """
+    return ORJSONResponse(status_code=status_code, content=content, headers={"Connection": "close"})
+
+
+def upload_error(form, status_code, content):
+    """Error response for an upload, closing the connection if the file is still unread."""
+    if form is None or not form.file_complete:
+        return reject_unread(status_code, content)
+    return ORJSONResponse(status_code=status_code, content=content)
+
+
+def file_url_for(s3_file_key):
+    return BUCKET_URL_PREFIX + quote(s3_file_key, safe="/")
+
+
+def remember_key(s3_file_key):
+    if existing_keys is not None:
+        existing_keys[s3_file_key] = True
+
+
+def forget_key(s3_file_key):
+    if existing_keys is not None:
+        existing_keys.pop(s3_file_key, None)
+
+
+async def upload_part(s3_client, s3_file_key, upload_id, part_number, body):
+    response = await asyncio.to_thread(
+        s3_client.upload_part,
+        Bucket=BUCKET_NAME,
+        Key=s3_file_key,
+        UploadId=upload_id,
+        PartNumber=part_number,
+        Body=body
+    )
+    return {"ETag": response["ETag"], "PartNumber": part_number}
+
+
+async def upload_stream(s3_client, chunks, s3_file_key, content_type):
+    """Upload an async stream of bytes to S3 without buffering the whole file.
+
+    Streams shorter than MULTIPART_THRESHOLD are sent with a single PutObject;
+    longer ones switch to a multipart upload. Either way the write is conditional
+    on the key not existing, so S3 raises PreconditionFailed instead of overwriting.
+    """
+    head = bytearray()
+    async for chunk in chunks:
+        head += chunk
+        if len(head) >= MULTIPART_THRESHOLD:
+            break
+    else:
+        await asyncio.to_thread(
+            s3_client.put_object,
+            Bucket=BUCKET_NAME,
+            Key=s3_file_key,
+            Body=bytes(head),
+            ContentType=content_type,
+            IfNoneMatch="*"
+        )
+        return
+
+    await upload_multipart(s3_client, head, chunks, s3_file_key, content_type)
+
+
+async def upload_multipart(s3_client, head, chunks, s3_file_key, content_type):
+    """Upload ``head`` followed by the rest of ``chunks`` as a multipart upload.
+
+    Parts are PUT concurrently (up to MULTIPART_MAX_CONCURRENCY at a time, and
+    MAX_BUFFERED_PARTS across the worker) while the rest of the body is still
+    being received.
+    """
+    upload = await asyncio.to_thread(
+        s3_client.create_multipart_upload,
+        Bucket=BUCKET_NAME,
+        Key=s3_file_key,
+        ContentType=content_type
+    )
+    upload_id = upload["UploadId"]
+
+    semaphore = asyncio.Semaphore(MULTIPART_MAX_CONCURRENCY)
+    tasks = []
+
+    def release_slots():
+        buffered_parts.release()
+        semaphore.release()
+
+    async def send_part(part_number, body):
+        try:
+            return await upload_part(s3_client, s3_file_key, upload_id, part_number, body)
+        finally:
+            release_slots()
+
+    def raise_failed_part():
+        # Stop reading the body as soon as any part has failed
+        for task in tasks:
+            if task.done() and not task.cancelled() and task.exception():
+                raise task.exception()
+
+    async def start_part(buffer):
+        raise_failed_part()
+        # Wait for free slots before copying the buffer, so neither a fast client nor
+        # many concurrent uploads can pile up unbounded parts in memory
+        await semaphore.acquire()
+        try:
+            await buffered_parts.acquire()
+        except BaseException:
+            semaphore.release()
+            raise
+        try:
+            raise_failed_part()
+        except BaseException:
+            release_slots()
+            raise
+        body = bytes(buffer)
+        buffer.clear()
+        tasks.append(asyncio.create_task(send_part(len(tasks) + 1, body)))
+
+    try:
+        buffer = head
+        async for chunk in chunks:
+            buffer += chunk
+            if len(buffer) >= MULTIPART_CHUNK_SIZE:
+                await start_part(buffer)
+        # Flush the remainder; an empty file still needs one part
+        if buffer or not tasks:
+            await start_part(buffer)
+        parts = await asyncio.gather(*tasks)
+
+        await asyncio.to_thread(
+            s3_client.complete_multipart_upload,
+            Bucket=BUCKET_NAME,
+            Key=s3_file_key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+            IfNoneMatch="*"
+        )
+    except BaseException:
+        # Also runs on cancellation (client disconnect, shutdown)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Don't leave orphaned parts behind (they are billed until aborted)
+        try:
+            await asyncio.shield(asyncio.to_thread(
+                s3_client.abort_multipart_upload,
+                Bucket=BUCKET_NAME,
+                Key=s3_file_key,
+                UploadId=upload_id
+            ))
+        except Exception as e:
+            logger.error(f"Failed to abort multipart upload for {s3_file_key}: {str(e)}")
+        raise
+
 
 @app.post('/api/upload')
-async def upload_pdf(file: UploadFile = Form(...)):
+async def upload_pdf(request: Request):
+    s3_client = request.app.state.s3
+    filename = None
+    form = None
     try:
-        logger.info(f"Uploading {file.filename}")
-        
-        # Validate file type
-        if file.content_type not in ALLOWED_MIME_TYPES:
-            return JSONResponse(
-                status_code=400,
-                content={"message": "Invalid file type. Only PDF files are allowed."}
-            )
+        # Stream the form body instead of spooling it through UploadFile
+        form = MultipartFileStream(request)
+        filename, content_type = await form.read_headers()
+        logger.info(f"Uploading {filename}")
+
+        if not KEY_RE.fullmatch(filename):
+            return reject_unread(400, {"message": "Invalid file name."})
+
+        # Validate file type from the part headers, before any of the file body is read,
+        # then sniff the content rather than trusting the client's header
+        if content_type not in ALLOWED_MIME_TYPES and content_type != GENERIC_MIME_TYPE:
+            return reject_unread(400, {"message": "Invalid file type. Only PDF files are allowed."})
+        if not (await form.peek(PDF_SIGNATURE_WINDOW)).lstrip().startswith(PDF_SIGNATURE):
+            logger.warning(f"Rejected {filename}: content is not a PDF")
+            return reject_unread(400, {"message": "Invalid file type. Only PDF files are allowed."})
+        content_type = "application/pdf"
 
         # Define the S3 file key
-        s3_file_key = f"{file.filename}"
+        s3_file_key = f"{filename}"
+
+        # The cache is per worker and may be stale (e.g. deleted via another worker),
+        # so a hit is only a hint: confirm with S3 before rejecting without the body
+        if existing_keys is not None and s3_file_key in existing_keys:
+            if await key_exists(s3_client, s3_file_key):
+                file_url = file_url_for(s3_file_key)
+                return reject_unread(409, {
+                    "message": "File already exists in the S3 bucket.",
+                    "file_url": file_url
+                })
+            forget_key(s3_file_key)
 
-        # Check if the file already exists in S3
+        # Upload the file to S3 as it arrives. The write is conditional on the key
+        # not existing yet, so no separate existence check is needed.
         try:
-            s3_client.head_object(Bucket=BUCKET_NAME, Key=s3_file_key)
-            # If file exists, return its URL
-            file_url = f"https://{BUCKET_NAME}.s3.amazonaws.com/{s3_file_key}"
-            return JSONResponse(
+            await upload_stream(s3_client, form.iter_file(), s3_file_key, content_type)
+        except ClientError as e:
+            if e.response['Error']['Code'] not in KEY_EXISTS_ERROR_CODES:
+                raise
+            remember_key(s3_file_key)
+            file_url = file_url_for(s3_file_key)
+            return ORJSONResponse(
                 status_code=409,
                 content={
                     "message": "File already exists in the S3 bucket.",
                     "file_url": file_url
                 }
             )
-        except s3_client.exceptions.ClientError as e:
-            if e.response['Error']['Code'] != '404':
-                logger.error(f"Failed to check if file exists: {str(e)}")
-                return JSONResponse(
-                    status_code=500,
-                    content={"message": "Failed to check if file exists in S3."}
-                )
-            # File doesn't exist; continue to upload
-
-        # Upload the file to S3
-        s3_client.upload_fileobj(
-            file.file,
-            BUCKET_NAME,
-            s3_file_key,
-            ExtraArgs={"ContentType": file.content_type}
-        )
+
+        remember_key(s3_file_key)
 
         # Return success response with S3 file path
-        file_url = f"https://{BUCKET_NAME}.s3.amazonaws.com/{s3_file_key}"
-        return JSONResponse(
+        file_url = file_url_for(s3_file_key)
+        return ORJSONResponse(
             status_code=200,
             content={
                 "message": "File uploaded successfully",
                 "file_url": file_url
             }
         )
+    except MultipartStreamError as e:
+        logger.warning(f"Rejected malformed upload: {str(e)}")
+        return reject_unread(400, {"message": str(e)})
+    except NoCredentialsError:
+        return upload_error(form, 500, {"message": "AWS credentials not available"})
+    except Exception as e:
+        logger.error(f"Failed to upload {filename}: {str(e)}")
+        return upload_error(form, 500, {"message": str(e)})
+
+
+@app.post('/api/exists')
+async def check_existing(request: Request):
+    """Check many document names at once so clients only upload the missing ones."""
+    s3_client = request.app.state.s3
+    try:
+        try:
+            body = await request.json()
+        except ValueError:
+            return ORJSONResponse(
+                status_code=400,
+                content={"message": "Request body must be valid JSON."}
+            )
+        if not isinstance(body, dict):
+            return ORJSONResponse(
+                status_code=400,
+                content={"message": "Request body must be a JSON object."}
+            )
+        document_names = body.get("document_names")
+
+        if not isinstance(document_names, list) or not document_names:
+            return ORJSONResponse(
+                status_code=400,
+                content={"message": "document_names must be a non-empty list."}
+            )
+        if len(document_names) > MAX_BATCH_NAMES:
+            return ORJSONResponse(
+                status_code=400,
+                content={"message": f"At most {MAX_BATCH_NAMES} document_names are allowed."}
+            )
+        if not all(isinstance(name, str) and KEY_RE.fullmatch(name) for name in document_names):
+            return ORJSONResponse(
+                status_code=400,
+                content={"message": "Invalid document_name in document_names."}
+            )
+        # Answer each name once, in the order first given
+        document_names = list(dict.fromkeys(document_names))
+
+        found = await find_existing_keys(s3_client, document_names)
+        # The answer is authoritative, so it also clears stale cache entries
+        for name in document_names:
+            if name in found:
+                remember_key(name)
+            else:
+                forget_key(name)
+
+        return ORJSONResponse(
+            status_code=200,
+            content={
+                "existing": [name for name in document_names if name in found],
+                "missing": [name for name in document_names if name not in found]
+            }
+        )
     except NoCredentialsError:
-        return JSONResponse(
+        logger.error("AWS credentials not available.")
+        return ORJSONResponse(
             status_code=500,
             content={"message": "AWS credentials not available"}
         )
     except Exception as e:
-        logger.error(f"Failed to upload {file.filename}: {str(e)}")
-        return JSONResponse(
+        logger.error(f"Failed to check existing documents: {str(e)}")
+        return ORJSONResponse(
             status_code=500,
             content={"message": str(e)}
         )
-    
+
+
 @app.delete('/api/delete')
 async def delete_pdf(request: Request):
+    s3_client = request.app.state.s3
     try:
         body = await request.json()
         document_name = body.get("document_name")
 
         if not document_name:
             logger.warning("document_name is missing in the request.")
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=400,
                 content={"message": "document_name is required in the request body."}
             )
 
-        logger.info(f"Deleting {document_name} from S3.")
+        if not is_safe_document_name(document_name):
+            logger.warning(f"Invalid document_name {document_name!r} in the request.")
+            return ORJSONResponse(
+                status_code=400,
+                content={"message": "Invalid document_name."}
+            )
 
-        # Check if the file exists in S3
-        try:
-            s3_client.head_object(Bucket=BUCKET_NAME, Key=document_name)
-        except ClientError as e:
-            if e.response['Error']['Code'] == "404":
-                logger.warning(f"File {document_name} not found in S3.")
-                return JSONResponse(
-                    status_code=404,
-                    content={"message": "File not found in S3."}
-                )
-            else:
-                logger.error(f"Error checking file in S3: {str(e)}")
-                return JSONResponse(
-                    status_code=500,
-                    content={"message": "Failed to check file in S3."}
-                )
+        logger.info(f"Deleting {document_name} from S3.")
 
-        # Delete the file from S3
-        s3_client.delete_object(Bucket=BUCKET_NAME, Key=document_name)
+        # Delete the file from S3. DeleteObject succeeds whether or not the key
+        # exists, so no separate existence check is needed.
+        await asyncio.to_thread(s3_client.delete_object, Bucket=BUCKET_NAME, Key=document_name)
+        forget_key(document_name)
 
         logger.info(f"Successfully deleted {document_name} from S3.")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
             content={"message": "File deleted successfully", "document_name": document_name}
         )
 
     except NoCredentialsError:
         logger.error("AWS credentials not available.")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={"message": "AWS credentials not available"}
         )
     except Exception as e:
         logger.error(f"Failed to delete {document_name}: {str(e)}")
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={"message": str(e)}
         )
@@ -160,6 +528,9 @@ async def delete_pdf(request: Request):
 # Run the app
 # To run: uvicorn filename:app --reload
 if __name__ == "__main__":
+    import os
     import uvicorn
     port = int(os.environ.get("PORT", 8080))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    workers = int(os.environ.get("UVICORN_WORKERS", 4))
+    # "auto" picks uvloop/httptools when installed (uvloop isn't available on Windows)
+    uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers, loop="auto", http="auto")
\ No newline at end of file
@@ -0,0 +1,117 @@
+from collections import deque
+
+from fastapi import Request
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+
+class MultipartStreamError(ValueError):
+    pass
+
+
+class MultipartFileStream:
+    """Incrementally parse a multipart/form-data body and expose one file field as a stream.
+
+    Unlike ``UploadFile``, nothing is spooled to memory or disk: chunks are parsed
+    as they arrive from ``request.stream()`` and handed straight to the caller.
+    """
+
+    def __init__(self, request: Request, field_name: str = "file"):
+        content_type, params = parse_options_header(request.headers.get("content-type"))
+        boundary = params.get(b"boundary")
+        if content_type != b"multipart/form-data" or not boundary:
+            raise MultipartStreamError("Request must be multipart/form-data.")
+
+        self.field_name = field_name
+        self.filename = None
+        self.content_type = None
+
+        self._stream = request.stream()
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._in_file = False
+        self._file_done = False
+        self._pending = deque()
+
+    @property
+    def file_complete(self):
+        """Whether the whole file part has been received."""
+        return self._file_done
+
+    async def read_headers(self):
+        """Read just enough of the body to learn the file part's filename and content type."""
+        while self.filename is None:
+            if not await self._feed():
+                raise MultipartStreamError(f"Missing '{self.field_name}' field in form data.")
+        return self.filename, self.content_type
+
+    async def peek(self, size):
+        """Return up to ``size`` leading bytes of the file without consuming them."""
+        while sum(map(len, self._pending)) < size and not self._file_done:
+            if not await self._feed():
+                raise MultipartStreamError("Request body ended before the file was complete.")
+        return b"".join(self._pending)[:size]
+
+    async def iter_file(self):
+        """Yield the file part's content as it is received."""
+        while True:
+            while self._pending:
+                yield self._pending.popleft()
+            if self._file_done:
+                return
+            if not await self._feed():
+                raise MultipartStreamError("Request body ended before the file was complete.")
+
+    async def _feed(self):
+        try:
+            chunk = await self._stream.__anext__()
+        except StopAsyncIteration:
+            return False
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError as e:
+            raise MultipartStreamError(f"Malformed form data: {str(e)}") from e
+        return True
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition"))
+        if self.filename is not None or options.get(b"name") != self.field_name.encode():
+            return
+        if b"filename" not in options:
+            raise MultipartStreamError(f"'{self.field_name}' field must be a file.")
+        self.filename = options[b"filename"].decode("utf-8", errors="replace")
+        self.content_type = self._headers.get(b"content-type", b"").decode("latin-1")
+        self._in_file = True
+
+    def _on_part_data(self, data, start, end):
+        if self._in_file:
+            self._pending.append(data[start:end])
+
+    def _on_part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self._file_done = True
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# config.py exits on missing settings, so provide them before anything imports it
+os.environ.setdefault("DB_URL", "sqlite://")
+os.environ.setdefault("BUCKET_NAME", "test-bucket")
+os.environ.setdefault("AWS_ACCESS_KEY", "test")
+os.environ.setdefault("AWS_SECRET_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """Swap the app's S3 client for an in-memory fake for the duration of a test."""
+    import main
+    from helpers import FakeS3
+
+    fake = FakeS3()
+    monkeypatch.setattr(main.app.state, "s3", fake, raising=False)
+    return fake
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import threading
+import time
+
+from botocore.exceptions import ClientError
+from starlette.requests import Request
+
+BOUNDARY = "testboundary"
+
+
+def form_body(*parts):
+    """Build a multipart/form-data body from (name, filename, content_type, data) tuples."""
+    body = b""
+    for name, filename, content_type, data in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n".encode()
+        if content_type is not None:
+            body += f"Content-Type: {content_type}\r\n".encode()
+        body += b"\r\n" + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def json_request(payload, app=None):
+    return make_request([json.dumps(payload).encode()], content_type="application/json", app=app)
+
+
+def make_request(chunks, content_type=f"multipart/form-data; boundary={BOUNDARY}", app=None, delay=0):
+    """A real Starlette request whose body arrives as the given chunks, ``delay`` seconds apart."""
+    messages = [{"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks]
+    messages.append({"type": "http.request", "body": b"", "more_body": False})
+
+    async def receive():
+        await asyncio.sleep(delay)
+        return messages.pop(0)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/upload",
+        "headers": [(b"content-type", content_type.encode())],
+    }
+    if app is not None:
+        scope["app"] = app
+    return Request(scope, receive)
+
+
+class FakeS3:
+    """In-memory stand-in for the parts of the boto3 S3 client the service uses."""
+
+    def __init__(self, fail_part=None):
+        self.objects = {}
+        self.uploads = {}
+        self.aborted = []
+        self.heads = []
+        self.content_types = {}
+        self.listings = []
+        self.page_size = 1000
+        self.fail_part = fail_part
+        self.part_delay = 0
+        self.parts_in_flight = 0
+        self.max_parts_in_flight = 0
+        self.lock = threading.Lock()
+
+    def _check_absent(self, key, operation):
+        if key in self.objects:
+            raise ClientError({"Error": {"Code": "PreconditionFailed"}}, operation)
+
+    def put_object(self, Bucket, Key, Body, ContentType, IfNoneMatch):
+        with self.lock:
+            self._check_absent(Key, "PutObject")
+            self.objects[Key] = Body
+            self.content_types[Key] = ContentType
+
+    def create_multipart_upload(self, Bucket, Key, ContentType):
+        with self.lock:
+            upload_id = f"upload-{len(self.uploads) + 1}"
+            self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber == self.fail_part:
+            raise ClientError({"Error": {"Code": "AccessDenied"}}, "UploadPart")
+        with self.lock:
+            self.parts_in_flight += 1
+            self.max_parts_in_flight = max(self.max_parts_in_flight, self.parts_in_flight)
+        time.sleep(self.part_delay)
+        with self.lock:
+            self.parts_in_flight -= 1
+            self.uploads[UploadId][PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, IfNoneMatch):
+        with self.lock:
+            self._check_absent(Key, "CompleteMultipartUpload")
+            parts = self.uploads.pop(UploadId)
+            numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+            self.objects[Key] = b"".join(parts[number] for number in numbers)
+
+    def head_object(self, Bucket, Key):
+        with self.lock:
+            self.heads.append(Key)
+            if Key not in self.objects:
+                raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix="", StartAfter="", ContinuationToken=None):
+        # Real S3 ignores StartAfter once a continuation token is given
+        after = ContinuationToken if ContinuationToken is not None else StartAfter
+        with self.lock:
+            self.listings.append({"Prefix": Prefix, "StartAfter": StartAfter})
+            keys = sorted(key for key in self.objects if key.startswith(Prefix) and key > after)
+        page = keys[:self.page_size]
+        response = {"Contents": [{"Key": key} for key in page], "IsTruncated": len(keys) > len(page)}
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = page[-1]
+        return response
+
+    def delete_object(self, Bucket, Key):
+        with self.lock:
+            self.objects.pop(Key, None)
+        return {}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        with self.lock:
+            self.uploads.pop(UploadId, None)
+            self.aborted.append(UploadId)
@@ -0,0 +1,20 @@
+import pytest
+from pydantic import ValidationError
+
+from config import Settings
+
+
+def test_multipart_defaults_are_valid():
+    settings = Settings()
+
+    assert settings.s3_multipart_threshold <= settings.s3_multipart_chunksize
+
+
+@pytest.mark.parametrize("overrides", [
+    {"s3_multipart_chunksize": 1024 * 1024},
+    {"s3_multipart_threshold": 64 * 1024 * 1024, "s3_multipart_chunksize": 32 * 1024 * 1024},
+    {"s3_max_buffered_parts": 0},
+])
+def test_invalid_multipart_settings_are_rejected(overrides):
+    with pytest.raises(ValidationError):
+        Settings(**overrides)
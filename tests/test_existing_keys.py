@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import main
+from helpers import FakeS3, json_request, make_request
+
+
+def find(s3, names):
+    return asyncio.run(main.find_existing_keys(s3, names))
+
+
+def check(payload):
+    response = asyncio.run(main.check_existing(json_request(payload, app=main.app)))
+    return response.status_code, json.loads(response.body)
+
+
+def test_names_without_common_prefix_use_heads():
+    s3 = FakeS3()
+    s3.objects.update({"big.pdf": b"", "other.pdf": b""})
+
+    assert find(s3, ["big.pdf", "zzz.pdf", "a b (1).pdf"]) == {"big.pdf"}
+    assert s3.listings == []
+    assert sorted(s3.heads) == ["a b (1).pdf", "big.pdf", "zzz.pdf"]
+
+
+def test_names_with_common_prefix_use_one_listing():
+    s3 = FakeS3()
+    s3.objects.update({f"lec{i:02d}.pdf": b"" for i in range(30)})
+
+    assert find(s3, ["lec03.pdf", "lec99.pdf", "lec10.pdf"]) == {"lec03.pdf", "lec10.pdf"}
+    assert len(s3.listings) == 1
+    assert s3.heads == []
+
+
+def test_listing_starts_at_the_smallest_name():
+    s3 = FakeS3()
+    # Keys sorting just before "lec10.pdf" must not be listed
+    s3.objects.update({"lec1": b"", "lec1.pdf": b"", "lec10.pd": b"", "lec10.pdf": b"", "lec11.pdf": b""})
+    s3.page_size = 1
+
+    found = find(s3, ["lec10.pdf", "lec11.pdf"])
+
+    assert found == {"lec10.pdf", "lec11.pdf"}
+    assert s3.listings[0]["Prefix"] == "lec1"
+    assert "lec10.pd" < s3.listings[0]["StartAfter"] < "lec10.pdf"
+    assert s3.heads == []
+
+
+def test_listing_falls_back_to_heads_after_page_cap():
+    s3 = FakeS3()
+    s3.objects.update({f"m{i:03d}.pdf": b"" for i in range(50)})
+    s3.page_size = 5
+    names = ["m000.pdf", "m004.pdf", "m020.pdf", "m049.pdf", "m999.pdf"]
+
+    assert find(s3, names) == {"m000.pdf", "m004.pdf", "m020.pdf", "m049.pdf"}
+    assert len(s3.listings) == main.EXISTS_MAX_LIST_PAGES
+    # The pages covered m000-m014; only names past that are HEADed
+    assert sorted(s3.heads) == ["m020.pdf", "m049.pdf", "m999.pdf"]
+
+
+def test_exists_endpoint_dedupes_and_keeps_order(s3):
+    s3.objects.update({"b.pdf": b""})
+
+    status, body = check({"document_names": ["c.pdf", "b.pdf", "c.pdf", "b.pdf"]})
+
+    assert status == 200
+    assert body == {"existing": ["b.pdf"], "missing": ["c.pdf"]}
+
+
+def test_exists_endpoint_rejects_bad_input(s3):
+    for payload in (["x"], "x", {"document_names": []}, {"document_names": ["../x"]},
+                    {"document_names": ["a.pdf"] * (main.MAX_BATCH_NAMES + 1)}):
+        assert check(payload)[0] == 400
+
+
+def test_exists_endpoint_rejects_malformed_json(s3):
+    request = make_request([b"{not json"], content_type="application/json", app=main.app)
+
+    assert asyncio.run(main.check_existing(request)).status_code == 400
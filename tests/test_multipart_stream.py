@@ -0,0 +1,84 @@
+import asyncio
+import random
+
+import pytest
+
+from helpers import form_body, make_request
+from multipart_stream import MultipartFileStream, MultipartStreamError
+
+
+def split_randomly(data, seed):
+    rng = random.Random(seed)
+    chunks = []
+    while data:
+        size = rng.randint(1, 64)
+        chunks.append(data[:size])
+        data = data[size:]
+    return chunks
+
+
+async def read_all(form):
+    filename, content_type = await form.read_headers()
+    content = b"".join([chunk async for chunk in form.iter_file()])
+    return filename, content_type, content
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_file_survives_random_chunk_splits(seed):
+    data = bytes(random.Random(seed).getrandbits(8) for _ in range(2000))
+    body = form_body(
+        ("company", None, None, b"before"),
+        ("file", "notes.pdf", "application/pdf", data),
+        ("comment", None, None, b"after"),
+    )
+    form = MultipartFileStream(make_request(split_randomly(body, seed)))
+
+    assert asyncio.run(read_all(form)) == ("notes.pdf", "application/pdf", data)
+
+
+def test_empty_file():
+    body = form_body(("file", "empty.pdf", "application/pdf", b""))
+    form = MultipartFileStream(make_request([body]))
+
+    assert asyncio.run(read_all(form)) == ("empty.pdf", "application/pdf", b"")
+
+
+def test_peek_does_not_consume():
+    body = form_body(("file", "a.pdf", "application/pdf", b"%PDF-1.7 content"))
+    form = MultipartFileStream(make_request(split_randomly(body, 0)))
+
+    async def run():
+        await form.read_headers()
+        head = await form.peek(5)
+        return head, b"".join([chunk async for chunk in form.iter_file()])
+
+    assert asyncio.run(run()) == (b"%PDF-", b"%PDF-1.7 content")
+
+
+def test_truncated_body():
+    body = form_body(("file", "a.pdf", "application/pdf", b"x" * 100))
+    form = MultipartFileStream(make_request([body[:-60]]))
+
+    with pytest.raises(MultipartStreamError):
+        asyncio.run(read_all(form))
+
+
+def test_missing_file_field():
+    body = form_body(("other", None, None, b"value"))
+    form = MultipartFileStream(make_request([body]))
+
+    with pytest.raises(MultipartStreamError):
+        asyncio.run(form.read_headers())
+
+
+def test_file_field_without_filename():
+    body = form_body(("file", None, None, b"value"))
+    form = MultipartFileStream(make_request([body]))
+
+    with pytest.raises(MultipartStreamError):
+        asyncio.run(form.read_headers())
+
+
+def test_non_multipart_body():
+    with pytest.raises(MultipartStreamError):
+        MultipartFileStream(make_request([b"{}"], content_type="application/json"))
@@ -0,0 +1,198 @@
+import asyncio
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+from cachetools import TTLCache
+
+import main
+from helpers import FakeS3, form_body, json_request, make_request
+
+
+def upload(filename, data=b"%PDF-1.7 test", content_type="application/pdf"):
+    body = form_body(("file", filename, content_type, data))
+    return asyncio.run(main.upload_pdf(make_request([body], app=main.app)))
+
+
+def delete(document_name):
+    return asyncio.run(main.delete_pdf(json_request({"document_name": document_name}, app=main.app)))
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    existing_keys = TTLCache(maxsize=100, ttl=60)
+    monkeypatch.setattr(main, "existing_keys", existing_keys)
+    return existing_keys
+
+
+def test_upload_remembers_key(s3, cache):
+    assert upload("a.pdf").status_code == 200
+    assert "a.pdf" in cache
+
+
+def test_confirmed_cache_hit_returns_409(s3, cache):
+    s3.objects["a.pdf"] = b"original"
+    cache["a.pdf"] = True
+
+    response = upload("a.pdf")
+
+    assert response.status_code == 409
+    assert json.loads(response.body)["file_url"].endswith("/a.pdf")
+    assert s3.heads == ["a.pdf"]
+    assert s3.uploads == {}
+    assert s3.objects == {"a.pdf": b"original"}
+
+
+def test_stale_cache_hit_is_dropped_and_uploaded(s3, cache):
+    # e.g. deleted through another worker, whose cache this worker doesn't see
+    cache["a.pdf"] = True
+
+    response = upload("a.pdf", b"%PDF-1.7 new")
+
+    assert response.status_code == 200
+    assert s3.heads == ["a.pdf"]
+    assert s3.objects == {"a.pdf": b"%PDF-1.7 new"}
+
+
+def test_delete_forgets_key(s3, cache):
+    s3.objects["a.pdf"] = b"original"
+    cache["a.pdf"] = True
+
+    assert delete("a.pdf").status_code == 200
+    assert "a.pdf" not in cache
+
+
+def test_delete_missing_key_succeeds_without_head(s3):
+    response = delete("missing.pdf")
+
+    assert response.status_code == 200
+    assert s3.heads == []
+
+
+@pytest.mark.parametrize("data", [b"%PDF-1.7 body", b"\r\n  %PDF-1.4 body"])
+def test_pdf_signature_is_accepted(s3, data):
+    assert upload("a.pdf", data).status_code == 200
+    assert s3.objects == {"a.pdf": data}
+
+
+@pytest.mark.parametrize("data", [b"not a pdf", b"junk%PDF-1.7 body", b""])
+def test_content_without_leading_pdf_signature_is_rejected(s3, data):
+    response = upload("a.pdf", data)
+
+    assert response.status_code == 400
+    assert s3.objects == {}
+
+
+def test_octet_stream_pdf_is_stored_as_pdf(s3):
+    response = upload("a.pdf", content_type="application/octet-stream")
+
+    assert response.status_code == 200
+    assert s3.content_types == {"a.pdf": "application/pdf"}
+
+
+def test_octet_stream_non_pdf_is_rejected(s3):
+    assert upload("a.pdf", b"MZ binary", "application/octet-stream").status_code == 400
+    assert s3.objects == {}
+
+
+def test_disallowed_declared_type_is_rejected(s3):
+    assert upload("a.pdf", content_type="text/plain").status_code == 400
+    assert s3.objects == {}
+
+
+@pytest.mark.parametrize("filename", ["a", "notes.pdf", "My Notes (1).pdf", "x" * 255])
+def test_valid_file_names_are_accepted(s3, filename):
+    assert upload(filename).status_code == 200
+    assert filename in s3.objects
+
+
+@pytest.mark.parametrize("filename", [
+    "../x", "a/b.pdf", ".hidden.pdf", "   ", " a.pdf", "a.pdf ", "résumé.pdf", "a.pdf\n", "x" * 256,
+])
+def test_invalid_file_names_are_rejected(s3, filename):
+    response = upload(filename)
+
+    assert response.status_code == 400
+    assert s3.objects == {}
+
+
+@pytest.mark.parametrize("document_name", ["Q&A.pdf", "O'Brien.pdf", "Report, final.pdf", "résumé.pdf"])
+def test_delete_accepts_names_that_predate_key_re(s3, document_name):
+    s3.objects[document_name] = b"original"
+
+    assert delete(document_name).status_code == 200
+    assert s3.objects == {}
+
+
+@pytest.mark.parametrize("document_name", ["../x", "a/../b", "..", "./a.pdf", "", 5])
+def test_delete_rejects_unsafe_names(s3, document_name):
+    assert delete(document_name).status_code == 400
+
+
+def closes_connection(response):
+    return response.headers.get("connection") == "close"
+
+
+@pytest.mark.parametrize("filename, data, content_type", [
+    ("../x", b"%PDF-1.7", "application/pdf"),
+    ("a.pdf", b"%PDF-1.7", "text/plain"),
+    ("a.pdf", b"not a pdf", "application/pdf"),
+])
+def test_early_rejections_close_the_connection(s3, filename, data, content_type):
+    assert closes_connection(upload(filename, data, content_type))
+
+
+def test_malformed_body_closes_the_connection(s3):
+    request = make_request([b"--testboundary\r\ngarbage"], app=main.app)
+
+    response = asyncio.run(main.upload_pdf(request))
+
+    assert response.status_code == 400
+    assert closes_connection(response)
+
+
+def test_cache_hit_closes_the_connection(s3, cache):
+    s3.objects["a.pdf"] = b"original"
+    cache["a.pdf"] = True
+
+    assert closes_connection(upload("a.pdf"))
+
+
+def test_failed_head_during_cache_check_closes_the_connection(s3, cache, monkeypatch):
+    def head_object(Bucket, Key):
+        raise ClientError({"Error": {"Code": "403"}}, "HeadObject")
+
+    monkeypatch.setattr(s3, "head_object", head_object)
+    cache["a.pdf"] = True
+    body = form_body(("file", "a.pdf", "application/pdf", b"%PDF-1.7 " + b"x" * 20000))
+
+    response = asyncio.run(main.upload_pdf(make_request([body[:4096], body[4096:]], app=main.app)))
+
+    assert response.status_code == 500
+    assert closes_connection(response)
+
+
+def test_failed_part_closes_the_connection(monkeypatch):
+    monkeypatch.setattr(main, "MULTIPART_THRESHOLD", 20)
+    monkeypatch.setattr(main, "MULTIPART_CHUNK_SIZE", 10)
+    s3 = FakeS3(fail_part=1)
+    monkeypatch.setattr(main.app.state, "s3", s3, raising=False)
+    # Well past the sniffed window, so most of the file is still unread when the part fails
+    body = form_body(("file", "a.pdf", "application/pdf", b"%PDF-1.7 " + b"x" * 20000))
+    chunks = [body[i:i + 100] for i in range(0, len(body), 100)]
+
+    response = asyncio.run(main.upload_pdf(make_request(chunks, app=main.app, delay=0.002)))
+
+    assert response.status_code == 500
+    assert closes_connection(response)
+    assert s3.aborted == ["upload-1"]
+
+
+def test_completed_uploads_keep_the_connection(s3):
+    s3.objects["b.pdf"] = b"original"
+
+    assert not closes_connection(upload("a.pdf"))
+    # Duplicate found by the conditional write, after the whole body was read
+    response = upload("b.pdf")
+    assert response.status_code == 409
+    assert not closes_connection(response)
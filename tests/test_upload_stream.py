@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+from botocore.exceptions import ClientError
+
+import main
+from helpers import FakeS3, form_body, make_request
+
+
+async def stream(data, size=7):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+@pytest.fixture
+def small_parts(monkeypatch):
+    # Exercise the multipart path without allocating real 16 MiB+ buffers
+    monkeypatch.setattr(main, "MULTIPART_THRESHOLD", 20)
+    monkeypatch.setattr(main, "MULTIPART_CHUNK_SIZE", 10)
+
+
+def test_small_file_uses_single_put():
+    s3 = FakeS3()
+    asyncio.run(main.upload_stream(s3, stream(b"%PDF-small"), "a.pdf", "application/pdf"))
+
+    assert s3.objects == {"a.pdf": b"%PDF-small"}
+    assert s3.uploads == {}
+
+
+def test_large_file_uses_multipart(small_parts):
+    s3 = FakeS3()
+    data = bytes(range(256)) * 2
+    asyncio.run(main.upload_stream(s3, stream(data), "a.pdf", "application/pdf"))
+
+    assert s3.objects == {"a.pdf": data}
+    assert s3.uploads == {}
+    assert s3.aborted == []
+
+
+def test_duplicate_multipart_is_aborted(small_parts):
+    s3 = FakeS3()
+    s3.objects["a.pdf"] = b"original"
+
+    with pytest.raises(ClientError) as exc_info:
+        asyncio.run(main.upload_stream(s3, stream(b"x" * 100), "a.pdf", "application/pdf"))
+
+    assert exc_info.value.response["Error"]["Code"] == "PreconditionFailed"
+    assert s3.objects == {"a.pdf": b"original"}
+    assert s3.aborted == ["upload-1"]
+
+
+def test_failed_part_stops_reading_and_aborts(small_parts):
+    s3 = FakeS3(fail_part=2)
+    read = []
+
+    async def chunks():
+        for i in range(100):
+            read.append(i)
+            # Give the part threads a chance to finish before the next chunk
+            await asyncio.sleep(0.01)
+            yield b"x" * 10
+
+    with pytest.raises(ClientError):
+        asyncio.run(main.upload_stream(s3, chunks(), "a.pdf", "application/pdf"))
+
+    assert s3.aborted == ["upload-1"]
+    assert s3.uploads == {}
+    assert len(read) < 100
+
+
+def test_buffered_parts_are_capped_across_uploads(small_parts, monkeypatch):
+    monkeypatch.setattr(main, "buffered_parts", asyncio.Semaphore(2))
+    s3 = FakeS3()
+    s3.part_delay = 0.02
+
+    async def run():
+        await asyncio.gather(*(
+            main.upload_stream(s3, stream(b"x" * 100, size=10), f"{i}.pdf", "application/pdf")
+            for i in range(3)
+        ))
+
+    asyncio.run(run())
+
+    assert s3.max_parts_in_flight == 2
+    assert s3.objects == {f"{i}.pdf": b"x" * 100 for i in range(3)}
+
+
+def test_upload_endpoint_returns_409_for_existing_key(s3):
+    s3.objects["a.pdf"] = b"original"
+    body = form_body(("file", "a.pdf", "application/pdf", b"%PDF-1.7 new"))
+
+    response = asyncio.run(main.upload_pdf(make_request([body], app=main.app)))
+
+    assert response.status_code == 409
+    assert s3.objects == {"a.pdf": b"original"}